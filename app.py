@@ -3,9 +3,17 @@ De Anza College — C-ID Course Equivalency Lookup (DearPyGui version)
 High-performance GUI using GPU rendering for instant results display.
 """
 
+import argparse
+import json
+import math
 import re
 import os
-from typing import Tuple
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from typing import Iterable, List, Optional, Tuple
 
 import dearpygui.dearpygui as dpg
 import polars as pl
@@ -19,6 +27,7 @@ DEANZA_GRAY = (128, 128, 128)
 
 DATA_FILE = os.path.join(os.path.dirname(__file__), "cid.csv")
 HOME_INSTITUTION = "De Anza College"
+HOME_INSTITUTION_MATCH = "DE ANZA"  # Upper-case substring marking HOME_INSTITUTION rows, however the CSV spells it
 
 REQUIRED_COLS = ["C-ID #", "C-ID Descriptor", "Institution", "Local Course Title(s)", "Local Dept. Name & Number"]
 
@@ -26,6 +35,29 @@ REQUIRED_COLS = ["C-ID #", "C-ID Descriptor", "Institution", "Local Course Title
 SEARCH_DELAY_MS = 300
 MIN_SEARCH_CHARS = 2
 MAX_DISPLAY_RESULTS = 2000  # DearPyGui can handle more
+MAX_SUGGESTIONS = 12  # Rows shown in the autocomplete dropdown
+CID_QUERY_PATTERN = re.compile(r'^([A-Z]{2,5})[\s-]+(\d+[A-Z]?)\s*(.*)$')  # e.g. "ACCT 110", "BIOL-150 FOOTHILL"
+COMMON_WORDS = {'DE', 'LA', 'OF', 'AND', 'THE', 'FOR', 'IN', 'ON', 'AT', 'TO', 'A', 'AN'}
+
+# Relevance ranking (BM25 over course titles, plus fixed boosts)
+BM25_K1 = 1.2
+BM25_B = 0.75
+CID_EXACT_BOOST = 5.0
+DEPT_MATCH_BOOST = 2.0
+HOME_INSTITUTION_BOOST = 1.0
+# Tie-break for equal scores; these (with the descriptor) are smart_search's unique() key, so the order is total
+RANK_TIE_COLS = ["C-ID #", "Institution", "Local Dept. Name & Number", "Local Course Title(s)", "C-ID Descriptor"]
+
+# Query log and startup cache warming
+QUERY_LOG_FILE = os.path.join(os.path.dirname(__file__), "query_log.json")
+MAX_QUERY_LOG_ENTRIES = 500  # Least-used lookups are dropped when the log is saved
+WARM_TOP_N = 25  # Most frequent lookups precomputed at startup
+CACHE_BUDGET_BYTES = 64 * 1024 * 1024  # Estimated memory for cached results + display rows
+
+# Articulation matrix export: one row per De Anza course/C-ID, then one column per other institution
+MATRIX_KEY_COLS = ["Dept", "C-ID #", "C-ID Descriptor", "De Anza Course", "De Anza Title"]
+MATRIX_FORMATS = (".parquet", ".csv", ".xlsx")
+MATRIX_BATCH_DEPARTMENTS = 8  # Departments collected together in one pl.collect_all call
 
 
 class CidCsvError(Exception):
@@ -33,6 +65,11 @@ class CidCsvError(Exception):
     pass
 
 
+class MatrixExportError(Exception):
+    """Raised when the articulation matrix can't be built or written."""
+    pass
+
+
 def load_data(path: str) -> pl.DataFrame:
     """
     Load C-ID CSV and preprocess for faster searches.
@@ -97,6 +134,53 @@ def extract_dept_and_number(course_str: str) -> Tuple[str, str]:
     return "", course_str
 
 
+class PrefixIndex:
+    """
+    Sorted-array prefix index for type-ahead suggestions.
+    Terms are matched on their full name first, then on the start of any
+    later word (so 'HART' and 'COLL' both find 'Hartnell College').
+    Lookups are a bisect plus a scan of at most `limit` entries.
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        full = []
+        words = []
+        for term in terms:
+            term = (term or "").strip()
+            norm = " ".join(term.upper().split())
+            if not norm:
+                continue
+            full.append((norm, term))
+            for match in re.finditer(" ", norm):
+                words.append((norm[match.end():], term))
+        full.sort()
+        words.sort()
+        self._full_keys = [k for k, _ in full]
+        self._full_terms = [t for _, t in full]
+        self._word_keys = [k for k, _ in words]
+        self._word_terms = [t for _, t in words]
+
+    def __len__(self) -> int:
+        return len(self._full_keys)
+
+    def suggest(self, prefix: str, limit: int = MAX_SUGGESTIONS) -> List[str]:
+        """Return up to `limit` terms starting with `prefix` (case-insensitive)."""
+        prefix = " ".join(prefix.upper().split())
+        if not prefix or limit <= 0:
+            return []
+        
+        results = []
+        seen = set()
+        for keys, terms in ((self._full_keys, self._full_terms), (self._word_keys, self._word_terms)):
+            i = bisect_left(keys, prefix)
+            while i < len(keys) and len(results) < limit and keys[i].startswith(prefix):
+                if terms[i] not in seen:
+                    seen.add(terms[i])
+                    results.append(terms[i])
+                i += 1
+        return results
+
+
 def smart_search(df: pl.DataFrame, query: str) -> pl.DataFrame:
     """
     Smart search that handles any combination of keywords:
@@ -110,7 +194,7 @@ def smart_search(df: pl.DataFrame, query: str) -> pl.DataFrame:
         return pl.DataFrame()
     
     # Check if query looks like a C-ID (dept code + number, e.g., "ACCT 110")
-    cid_pattern = re.match(r'^([A-Z]{2,5})[\s-]+(\d+[A-Z]?)\s*(.*)$', query.upper())
+    cid_pattern = CID_QUERY_PATTERN.match(query.upper())
     if cid_pattern:
         # Search C-ID column directly
         dept_code = cid_pattern.group(1)
@@ -158,14 +242,13 @@ def smart_search(df: pl.DataFrame, query: str) -> pl.DataFrame:
             results = results.filter(pl.col("Institution_norm").str.contains(inst_kw))
     
     # Categorize remaining keywords
-    common_words = {'DE', 'LA', 'OF', 'AND', 'THE', 'FOR', 'IN', 'ON', 'AT', 'TO', 'A', 'AN'}
     dept_pattern = re.compile(r'^[A-Z]{2,5}$')
     
     dept_keywords = []
     title_keywords = []
     
     for keyword in non_institution_keywords:
-        if dept_pattern.match(keyword) and keyword not in common_words:
+        if dept_pattern.match(keyword) and keyword not in COMMON_WORDS:
             dept_count = results.filter(pl.col("Dept_norm").str.contains(rf"\b{re.escape(keyword)}")).height
             title_count = results.filter(pl.col("Title_norm").str.contains(keyword)).height
             
@@ -203,6 +286,536 @@ def smart_search(df: pl.DataFrame, query: str) -> pl.DataFrame:
     )
 
 
+def rank_results(df: pl.DataFrame, query: str, top_k: int = MAX_DISPLAY_RESULTS) -> pl.DataFrame:
+    """
+    Score search results against the query and return the best `top_k` rows, best first.
+    - Titles are scored with BM25 over whole words (document stats taken from the result set)
+    - Exact C-ID hits, department hits and the home institution get fixed boosts
+    Uses partial selection (top_k) instead of sorting every row. Ties are broken on
+    RANK_TIE_COLS, so the order doesn't depend on the input row order.
+    """
+    if df.is_empty() or top_k <= 0:
+        return df.head(0)
+    
+    query = query.strip().upper()
+    terms = [t for t in dict.fromkeys(query.split()) if t not in COMMON_WORDS]
+    
+    # Whole-word patterns: "ART" must not count inside "DEPARTMENT", nor "INTRO" inside "INTRODUCTION"
+    patterns = [
+        (r"\b" if re.match(r"\w", term[0]) else "") + re.escape(term) + (r"\b" if re.match(r"\w", term[-1]) else "")
+        for term in terms
+    ]
+    
+    title = pl.col("Title_norm")
+    doc_len = title.str.count_matches(r"\S+")
+    stats = df.select(
+        [doc_len.mean().alias("avgdl")]
+        + [title.str.contains(pattern).sum().alias(f"df_{i}") for i, pattern in enumerate(patterns)]
+    ).row(0, named=True)
+    avgdl = stats["avgdl"] or 1.0
+    n_docs = df.height
+    
+    # BM25 over titles
+    score = pl.lit(0.0)
+    for i, pattern in enumerate(patterns):
+        n_term = stats[f"df_{i}"]
+        if not n_term:
+            continue
+        idf = math.log((n_docs - n_term + 0.5) / (n_term + 0.5) + 1.0)
+        tf = title.str.count_matches(pattern).cast(pl.Float64)
+        score = score + idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * doc_len / avgdl))
+    
+    # Exact C-ID hit (e.g. "ACCT 110")
+    cid_pattern = CID_QUERY_PATTERN.match(query)
+    if cid_pattern:
+        cid_query = f"{cid_pattern.group(1)} {cid_pattern.group(2)}"
+        cid_hit = pl.col("C-ID #").fill_null("").str.to_uppercase().str.strip_chars() == cid_query
+        score = score + pl.when(cid_hit).then(CID_EXACT_BOOST).otherwise(0.0)
+    
+    # Department hit (e.g. "ACCT" matches "ACCT 1A")
+    dept_terms = [t for t in terms if re.match(r'^[A-Z]{2,5}$', t)]
+    if dept_terms:
+        dept_hit = pl.any_horizontal(
+            [pl.col("Dept_norm").str.contains(rf"^{re.escape(t)}\b") for t in dept_terms]
+        )
+        score = score + pl.when(dept_hit).then(DEPT_MATCH_BOOST).otherwise(0.0)
+    
+    is_home = pl.col("Institution_norm").str.contains(HOME_INSTITUTION.upper(), literal=True)
+    score = score + pl.when(is_home).then(HOME_INSTITUTION_BOOST).otherwise(0.0)
+    
+    # Null-free copies of the tie columns, so top_k and sort agree on where nulls go
+    tie_cols = [f"_tie_{i}" for i in range(len(RANK_TIE_COLS))]
+    ranked = df.with_columns(
+        [score.alias("_score")]
+        + [pl.col(c).fill_null("").alias(t) for c, t in zip(RANK_TIE_COLS, tie_cols)]
+    )
+    order = ["_score"] + tie_cols
+    if ranked.height > top_k:
+        ranked = ranked.top_k(top_k, by=order, reverse=[False] + [True] * len(tie_cols))
+    return ranked.sort(order, descending=[True] + [False] * len(tie_cols)).drop(order)
+
+
+def is_home_institution() -> pl.Expr:
+    """True for HOME_INSTITUTION rows; the one test shared by the course table and the matrix."""
+    return pl.col("Institution").str.to_uppercase().str.contains(HOME_INSTITUTION_MATCH, literal=True)
+
+
+def de_anza_course_table(df: pl.DataFrame) -> pl.DataFrame:
+    """
+    De Anza rows that have a C-ID, with 'Dept' and 'Number' split out of
+    'Local Dept. Name & Number'. Rows without a valid dept/number are dropped.
+    """
+    # Filter for De Anza courses only
+    de_anza_df = df.filter(is_home_institution())
+    
+    # Only keep courses with CIDs
+    de_anza_df = de_anza_df.filter(
+        pl.col("C-ID #").is_not_null() & (pl.col("C-ID #") != "")
+    )
+    
+    # Extract department and course info
+    # Match dept (letters/spaces) and number (starts with digit)
+    de_anza_df = de_anza_df.with_columns([
+        pl.col("Local Dept. Name & Number").str.extract(r'^([A-Z\s]+?)\s+([0-9].*)$', 1).fill_null("").str.strip_chars().alias("Dept"),
+        pl.col("Local Dept. Name & Number").str.extract(r'^([A-Z\s]+?)\s+([0-9].*)$', 2).fill_null("").str.strip_chars().alias("Number"),
+    ])
+    
+    # Remove rows without valid dept/number
+    return de_anza_df.filter(
+        (pl.col("Dept") != "") & (pl.col("Number") != "")
+    )
+
+
+def department_results(df: pl.DataFrame, de_anza_courses: pl.DataFrame, department: str) -> Tuple[pl.DataFrame, str]:
+    """
+    All courses, from every school, sharing a C-ID with a De Anza course in `department`.
+    Returns (rows, message); message is non-empty when there is nothing to show.
+    """
+    # Get all De Anza courses in this department
+    dept_courses = de_anza_courses.filter(pl.col("Dept") == department)
+    
+    if dept_courses.is_empty():
+        return df.head(0), "No courses found for this department"
+    
+    # Get all CIDs for this department
+    cids = dept_courses["C-ID #"].unique().to_list()
+    
+    # Find all courses with these CIDs from all schools
+    result_df = df.filter(pl.col("C-ID #").is_in(cids))
+    
+    if result_df.is_empty():
+        return result_df, "No courses found"
+    return result_df, ""
+
+
+def equivalency_results(
+    df: pl.DataFrame, de_anza_courses: pl.DataFrame, department: str, course_number: str
+) -> Tuple[pl.DataFrame, str]:
+    """
+    All courses, from every school, sharing a C-ID with De Anza `department` `course_number`.
+    Returns (rows, message); message is non-empty when there is nothing to show.
+    """
+    # Match by first course number (so "6A" matches "6A", "6A + BIOL 6C", etc.)
+    number_match = (
+        (pl.col("Number") == course_number)
+        | pl.col("Number").str.starts_with(course_number + " ")
+        | pl.col("Number").str.starts_with(course_number + "+")
+    )
+    de_anza_course = de_anza_courses.filter(
+        (pl.col("Dept") == department) & number_match
+    )
+    
+    if de_anza_course.is_empty():
+        return df.head(0), "Course not found"
+    
+    # Get the CID(s) for this course
+    cids = de_anza_course["C-ID #"].unique().to_list()
+    
+    if not cids or cids[0] == "":
+        return df.head(0), "No CID found for this course"
+    
+    # Find all courses with these CIDs
+    result_df = df.filter(pl.col("C-ID #").is_in(cids))
+    
+    if result_df.is_empty():
+        return result_df, "No equivalent courses found"
+    return result_df, ""
+
+
+# (total rows, unique C-IDs, table rows as (cid, school, dept, number, title, is_de_anza))
+DisplayRows = Tuple[int, int, List[Tuple[str, str, str, str, str, bool]]]
+
+
+def prepare_display(result_df: pl.DataFrame, rank_query: Optional[str] = None) -> DisplayRows:
+    """
+    Count, limit and format result rows for the table.
+    With rank_query, the top MAX_DISPLAY_RESULTS rows by relevance are kept;
+    otherwise the first MAX_DISPLAY_RESULTS rows are.
+    """
+    total_rows = result_df.height
+    unique_cids = result_df["C-ID #"].n_unique()
+    
+    if rank_query is not None:
+        result_df = rank_results(result_df, rank_query, MAX_DISPLAY_RESULTS)
+    else:
+        result_df = result_df.head(MAX_DISPLAY_RESULTS)
+    
+    rows = []
+    for row_dict in result_df.iter_rows(named=True):
+        school = (row_dict.get("Institution") or "").strip()
+        local_course = (row_dict.get("Local Dept. Name & Number") or "").strip()
+        dept, number = extract_dept_and_number(local_course)
+        title = (row_dict.get("Local Course Title(s)") or "").strip()
+        cid = (row_dict.get("C-ID #") or "").strip()
+        
+        # Check if De Anza
+        is_de_anza = HOME_INSTITUTION.upper() in school.upper()
+        rows.append((cid, school, dept, number, title, is_de_anza))
+    return total_rows, unique_cids, rows
+
+
+def lookup_key(kind: str, *parts: str) -> str:
+    """
+    Anonymized key for a lookup, used by the query log and the result cache.
+    E.g. ('dept', 'ACCT') -> 'dept:ACCT', ('course', 'ACCT', '1A') -> 'course:ACCT|1A',
+    ('search', ' acct  110 ') -> 'search:ACCT 110'.
+    """
+    if kind == "search":
+        return f"search:{' '.join(parts[0].upper().split())}"
+    return f"{kind}:{'|'.join(parts)}"
+
+
+def compute_lookup(
+    df: pl.DataFrame, de_anza_courses: pl.DataFrame, key: str
+) -> Tuple[pl.DataFrame, str, Optional[DisplayRows]]:
+    """
+    Run the lookup named by a lookup_key.
+    Returns (rows, message, display rows); message is non-empty (and display
+    rows None) when there is nothing to show.
+    """
+    kind, _, value = key.partition(":")
+    if kind == "dept":
+        result_df, message = department_results(df, de_anza_courses, value)
+        rank_query = None
+    elif kind == "course":
+        department, _, course_number = value.partition("|")
+        result_df, message = equivalency_results(df, de_anza_courses, department, course_number)
+        rank_query = None
+    elif kind == "search":
+        result_df = smart_search(df, value)
+        message = "" if not result_df.is_empty() else "No results"
+        rank_query = value
+    else:
+        raise ValueError(f"Unknown lookup key: {key}")
+    
+    if message:
+        return result_df, message, None
+    return result_df, message, prepare_display(result_df, rank_query)
+
+
+def matrix_institutions(df: pl.DataFrame) -> List[str]:
+    """Sorted names of every institution other than De Anza (the matrix columns)."""
+    others = df.filter(
+        ~is_home_institution()
+        & (pl.col("Institution").fill_null("").str.strip_chars() != "")
+    )
+    return others["Institution"].unique().sort().to_list()
+
+
+def _department_matrix_plan(
+    df: pl.DataFrame, de_anza_courses: pl.DataFrame, department: str, institutions: List[str]
+) -> Tuple[pl.LazyFrame, pl.LazyFrame]:
+    """Lazy (course x institution equivalents, De Anza courses) queries for one department."""
+    courses = (
+        de_anza_courses.lazy()
+        .filter(pl.col("Dept") == department)
+        .select([
+            pl.col("Dept"),
+            pl.col("C-ID #"),
+            pl.col("C-ID Descriptor"),
+            pl.col("Local Dept. Name & Number").alias("De Anza Course"),
+            pl.col("Local Course Title(s)").alias("De Anza Title"),
+        ])
+        .with_columns(pl.all().fill_null(""))
+        .unique(maintain_order=True)
+    )
+    
+    # Other schools' courses for this department's C-IDs, one row per (C-ID, institution)
+    equivalents = (
+        df.lazy()
+        .join(courses.select("C-ID #").unique(), on="C-ID #", how="semi")
+        .filter(pl.col("Institution").is_in(institutions))
+        .group_by(["C-ID #", "Institution"])
+        .agg(
+            pl.col("Local Dept. Name & Number").drop_nulls().str.strip_chars().unique().sort()
+            .str.join("; ").alias("Equivalent")
+        )
+    )
+    
+    return courses.join(equivalents, on="C-ID #", how="inner"), courses
+
+
+def _pivot_department_matrix(long_df: pl.DataFrame, courses_df: pl.DataFrame, institutions: List[str]) -> pl.DataFrame:
+    """Pivot one department's collected equivalents into its fixed-schema matrix slice."""
+    if long_df.is_empty():
+        wide = courses_df
+    else:
+        wide = courses_df.join(
+            long_df.pivot(on="Institution", index=MATRIX_KEY_COLS, values="Equivalent", aggregate_function="first"),
+            on=MATRIX_KEY_COLS,
+            how="left",
+        )
+    
+    missing = [pl.lit(None, dtype=pl.String).alias(name) for name in institutions if name not in wide.columns]
+    return (
+        wide.with_columns(missing)
+        .select(MATRIX_KEY_COLS + institutions)
+        .sort(["De Anza Course", "C-ID #", "C-ID Descriptor", "De Anza Title"])
+    )
+
+
+def department_matrix(
+    df: pl.DataFrame, de_anza_courses: pl.DataFrame, department: str, institutions: List[str]
+) -> pl.DataFrame:
+    """
+    One department's slice of the articulation matrix.
+    Each De Anza course/C-ID row gets a column per institution listing its
+    equivalent courses ('; '-separated), or null if it has none.
+    Columns are always MATRIX_KEY_COLS + institutions, so slices can be appended.
+    """
+    long_df, courses_df = pl.collect_all(_department_matrix_plan(df, de_anza_courses, department, institutions))
+    return _pivot_department_matrix(long_df, courses_df, institutions)
+
+
+class _CsvMatrixWriter:
+    def __init__(self, path: str, columns: List[str]):
+        self.columns = columns
+        self.wrote_header = False
+        self.file = open(path, "wb")
+
+    def write(self, chunk: pl.DataFrame):
+        chunk.write_csv(self.file, include_header=not self.wrote_header)
+        self.wrote_header = True
+
+    def close(self):
+        if not self.wrote_header:
+            pl.DataFrame(schema={c: pl.String for c in self.columns}).write_csv(self.file)
+        self.file.close()
+
+
+class _ParquetMatrixWriter:
+    def __init__(self, path: str, columns: List[str]):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise MatrixExportError(
+                "Writing Parquet needs pyarrow.\n\n"
+                "Install it with: uv sync --extra export"
+            )
+        self.path = path
+        self.columns = columns
+        self.pq = pq
+        self.writer = None
+
+    def write(self, chunk: pl.DataFrame):
+        table = chunk.to_arrow()
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is None:
+            self.write(pl.DataFrame(schema={c: pl.String for c in self.columns}))
+        self.writer.close()
+
+
+class _XlsxMatrixWriter:
+    def __init__(self, path: str, columns: List[str]):
+        try:
+            import xlsxwriter
+        except ImportError:
+            raise MatrixExportError(
+                "Writing XLSX needs xlsxwriter.\n\n"
+                "Install it with: uv sync --extra export"
+            )
+        self.file_create_error = xlsxwriter.exceptions.FileCreateError
+        # constant_memory flushes each row to disk as soon as it is written
+        self.workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+        self.sheet = self.workbook.add_worksheet("Articulation Matrix")
+        self.sheet.write_row(0, 0, columns, self.workbook.add_format({"bold": True}))
+        self.sheet.freeze_panes(1, len(MATRIX_KEY_COLS))
+        self.next_row = 1
+
+    def write(self, chunk: pl.DataFrame):
+        for row in chunk.iter_rows():
+            self.sheet.write_row(self.next_row, 0, row)
+            self.next_row += 1
+
+    def close(self):
+        # xlsxwriter only creates the file here, and reports failures with its own exception
+        try:
+            self.workbook.close()
+        except self.file_create_error as e:
+            raise OSError(str(e)) from e
+
+
+def export_articulation_matrix(df: pl.DataFrame, path: str) -> int:
+    """
+    Write the full De Anza x institution articulation matrix to path
+    (.parquet, .csv or .xlsx), in batches of MATRIX_BATCH_DEPARTMENTS departments.
+    Each batch's joins and group_bys are collected together with pl.collect_all,
+    so departments run in parallel on Polars' thread pool; only one batch of
+    slices is held in memory, and each slice is written as soon as it is pivoted.
+    Returns the number of rows written.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    writers = {".parquet": _ParquetMatrixWriter, ".csv": _CsvMatrixWriter, ".xlsx": _XlsxMatrixWriter}
+    if ext not in writers:
+        raise MatrixExportError(
+            f"Unsupported matrix format: {ext or '(none)'}\n\n"
+            f"Use one of: {', '.join(MATRIX_FORMATS)}"
+        )
+    
+    # Fail before building anything; Parquet and XLSX only create the file later
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(directory) or not os.access(directory, os.W_OK):
+        raise MatrixExportError(
+            f"Could not write {path}.\n\n"
+            f"The folder does not exist or is not writable:\n{directory}"
+        )
+    
+    de_anza_courses = de_anza_course_table(df)
+    departments = de_anza_courses["Dept"].unique().sort().to_list()
+    institutions = matrix_institutions(df)
+    
+    total_rows = 0
+    try:
+        writer = writers[ext](path, MATRIX_KEY_COLS + institutions)
+        try:
+            for start in range(0, len(departments), MATRIX_BATCH_DEPARTMENTS):
+                batch = departments[start:start + MATRIX_BATCH_DEPARTMENTS]
+                plans = [_department_matrix_plan(df, de_anza_courses, d, institutions) for d in batch]
+                collected = pl.collect_all([query for plan in plans for query in plan])
+                for i, department in enumerate(batch):
+                    chunk = _pivot_department_matrix(collected[2 * i], collected[2 * i + 1], institutions)
+                    collected[2 * i] = collected[2 * i + 1] = None  # Let the batch shrink as it is written
+                    writer.write(chunk)
+                    total_rows += chunk.height
+                    print(f"  {department}: {chunk.height} course(s)")
+        finally:
+            writer.close()
+    except OSError as e:
+        raise MatrixExportError(f"Could not write {path}.\n\nDetail: {e}")
+    
+    print(f"Wrote {total_rows} row(s) x {len(institutions)} institution(s) to {path}")
+    return total_rows
+
+
+class QueryLog:
+    """
+    Local, anonymized record of how often each lookup is used.
+    Only lookup keys and counts are stored: no timestamps, no user information.
+    """
+
+    def __init__(self, path: str = QUERY_LOG_FILE):
+        self.path = path
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read counts from disk; a missing or unreadable log starts empty."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.counts = Counter({str(k): int(v) for k, v in data.get("counts", {}).items()})
+        except FileNotFoundError:
+            self.counts = Counter()
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            print(f"Ignoring unreadable query log {self.path}: {e}")
+            self.counts = Counter()
+
+    def record(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+    def forget(self, key: str):
+        with self._lock:
+            self.counts.pop(key, None)
+
+    def most_common(self, n: int) -> List[str]:
+        with self._lock:
+            return [key for key, _ in self.counts.most_common(n)]
+
+    def save(self):
+        """Write the most used MAX_QUERY_LOG_ENTRIES counts to disk (atomically)."""
+        with self._lock:
+            counts = dict(self.counts.most_common(MAX_QUERY_LOG_ENTRIES))
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"counts": counts}, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not save query log {self.path}: {e}")
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of lookup results and their display rows,
+    bounded by an estimated memory budget.
+    """
+
+    def __init__(self, budget_bytes: int = CACHE_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self._entries = OrderedDict()  # key -> (entry, size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def estimate_size(entry: Tuple[pl.DataFrame, str, Optional[DisplayRows]]) -> int:
+        result_df, message, display = entry
+        size = result_df.estimated_size() + sys.getsizeof(message)
+        if display is not None:
+            size += sum(sys.getsizeof(value) for row in display[2] for value in row)
+        return size
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            self._entries.move_to_end(key)
+            return item[0]
+
+    def put(self, key: str, entry, evict: bool = True) -> bool:
+        """
+        Store an entry, evicting least recently used ones to make room.
+        With evict=False, nothing is evicted and False is returned if it doesn't fit.
+        """
+        size = self.estimate_size(entry)
+        if size > self.budget_bytes:
+            return False
+        
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.used_bytes -= old[1]
+            if not evict and self.used_bytes + size > self.budget_bytes:
+                if old is not None:
+                    self._entries[key] = old
+                    self.used_bytes += old[1]
+                return False
+            while self.used_bytes + size > self.budget_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.used_bytes -= evicted_size
+            self._entries[key] = (entry, size)
+            self.used_bytes += size
+            return True
+
+
 class EquivalencyApp:
     def __init__(self):
         self.df = None
@@ -215,6 +828,13 @@ class EquivalencyApp:
         self.selected_course = None
         self.de_anza_courses = None  # Will store De Anza courses with CIDs
         self._course_display_to_number = {}  # display str -> (first_num, full_number)
+        self._suggestion_to_target = {}  # display str -> (kind, value)
+        self.dept_index = None  # PrefixIndex over De Anza departments
+        self.institution_index = None  # PrefixIndex over institution names
+        self.cid_index = None  # PrefixIndex over C-ID numbers
+        self.query_log = QueryLog()  # Lookup counts, used to warm result_cache at startup
+        self.result_cache = ResultCache()
+        self.query_log.load()
         self.load_error = None  # Set if cid.csv is missing or invalid
         
         # Load data
@@ -279,6 +899,27 @@ class EquivalencyApp:
             dpg.add_text("De Anza College", color=DEANZA_GOLD)
             dpg.add_spacer(height=10)
             
+            # Type-ahead search: suggestions come from the prefix indexes, not the DataFrame
+            with dpg.group(horizontal=True):
+                dpg.add_text("Search:", color=DEANZA_BLUE)
+                dpg.add_input_text(
+                    tag="search_input",
+                    hint="Department, school or C-ID (e.g. ACCT, Foothill, BIOL 110)",
+                    callback=self.on_search_change,
+                    width=450,
+                )
+                dpg.add_button(label="Search", callback=lambda: self.do_search(dpg.get_value("search_input")), width=80)
+            dpg.add_listbox(
+                tag="suggest_listbox",
+                items=[],
+                callback=self.on_suggestion_selected,
+                width=450,
+                num_items=6,
+                indent=60,
+                show=False,
+            )
+            dpg.add_spacer(height=10)
+            
             # Selection area with two listboxes side by side
             with dpg.group(horizontal=True):
                 # Left side: Department selection
@@ -362,28 +1003,7 @@ class EquivalencyApp:
         if self.df is None:
             return
         
-        # Filter for De Anza courses only
-        de_anza_df = self.df.filter(
-            pl.col("Institution").str.to_uppercase().str.contains("DE ANZA")
-        )
-        
-        # Only keep courses with CIDs
-        de_anza_df = de_anza_df.filter(
-            pl.col("C-ID #").is_not_null() & (pl.col("C-ID #") != "")
-        )
-        
-        # Extract department and course info
-        # Match dept (letters/spaces) and number (starts with digit)
-        de_anza_df = de_anza_df.with_columns([
-            pl.col("Local Dept. Name & Number").str.extract(r'^([A-Z\s]+?)\s+([0-9].*)$', 1).fill_null("").str.strip_chars().alias("Dept"),
-            pl.col("Local Dept. Name & Number").str.extract(r'^([A-Z\s]+?)\s+([0-9].*)$', 2).fill_null("").str.strip_chars().alias("Number"),
-        ])
-        
-        # Remove rows without valid dept/number
-        de_anza_df = de_anza_df.filter(
-            (pl.col("Dept") != "") & (pl.col("Number") != "")
-        )
-        
+        de_anza_df = de_anza_course_table(self.df)
         self.de_anza_courses = de_anza_df
         print(f"Loaded {de_anza_df.height} De Anza courses with CIDs")
         dpg.set_primary_window("main_window", True)
@@ -400,6 +1020,32 @@ class EquivalencyApp:
             dpg.configure_item("dept_listbox", items=departments)
             print(f"Populated {len(departments)} departments")
     
+    def build_suggestion_indexes(self):
+        """Build the autocomplete prefix indexes once, after the data is loaded."""
+        if self.df is None or self.de_anza_courses is None:
+            return
+        
+        self.dept_index = PrefixIndex(self.de_anza_courses["Dept"].unique().to_list())
+        self.cid_index = PrefixIndex(self.df["C-ID #"].drop_nulls().unique().to_list())
+        self.institution_index = PrefixIndex(self.df["Institution"].drop_nulls().unique().to_list())
+        print(
+            f"Indexed {len(self.dept_index)} departments, {len(self.cid_index)} C-IDs, "
+            f"{len(self.institution_index)} institutions for autocomplete"
+        )
+    
+    def suggest(self, text: str, limit: int = MAX_SUGGESTIONS) -> List[Tuple[str, str]]:
+        """
+        Return (kind, value) suggestions for the typed text.
+        Departments come first, then C-IDs, then institutions.
+        """
+        suggestions = []
+        for kind, index in (("Dept", self.dept_index), ("C-ID", self.cid_index), ("School", self.institution_index)):
+            if index is None:
+                continue
+            for value in index.suggest(text, limit - len(suggestions)):
+                suggestions.append((kind, value))
+        return suggestions
+    
     def on_dept_selected(self, sender, app_data):
         """Called when a department is selected from the listbox."""
         self.selected_dept = app_data
@@ -510,68 +1156,70 @@ class EquivalencyApp:
         if self.de_anza_courses is None:
             return
         
-        # Get all De Anza courses in this department
-        dept_courses = self.de_anza_courses.filter(pl.col("Dept") == department)
-        
-        if dept_courses.is_empty():
-            dpg.set_value("results_count", "No courses found for this department")
-            self.clear_table()
-            return
-        
-        # Get all CIDs for this department
-        cids = dept_courses["C-ID #"].unique().to_list()
-        
-        # Find all courses with these CIDs from all schools
-        result_df = self.df.filter(pl.col("C-ID #").is_in(cids))
-        
-        if result_df.is_empty():
-            dpg.set_value("results_count", "No courses found")
+        result_df, message, display = self.cached_lookup(lookup_key("dept", department))
+        if message:
+            dpg.set_value("results_count", message)
             self.clear_table()
             return
         
         # Store and display results
         self.current_results = result_df
-        self.display_results(result_df, f"{department} Department")
+        self.display_results(result_df, f"{department} Department", display=display)
     
     def show_equivalencies(self, department, course_number):
         """Show all schools offering courses equivalent to the selected De Anza course."""
         if self.df is None or self.de_anza_courses is None:
             return
         
-        # Match by first course number (so "6A" matches "6A", "6A + BIOL 6C", etc.)
-        number_match = (
-            (pl.col("Number") == course_number)
-            | pl.col("Number").str.starts_with(course_number + " ")
-            | pl.col("Number").str.starts_with(course_number + "+")
-        )
-        de_anza_course = self.de_anza_courses.filter(
-            (pl.col("Dept") == department) & number_match
-        )
-        
-        if de_anza_course.is_empty():
-            dpg.set_value("results_count", "Course not found")
-            self.clear_table()
-            return
-        
-        # Get the CID(s) for this course
-        cids = de_anza_course["C-ID #"].unique().to_list()
-        
-        if not cids or cids[0] == "":
-            dpg.set_value("results_count", "No CID found for this course")
-            self.clear_table()
-            return
-        
-        # Find all courses with these CIDs
-        result_df = self.df.filter(pl.col("C-ID #").is_in(cids))
-        
-        if result_df.is_empty():
-            dpg.set_value("results_count", "No equivalent courses found")
+        result_df, message, display = self.cached_lookup(lookup_key("course", department, course_number))
+        if message:
+            dpg.set_value("results_count", message)
             self.clear_table()
             return
         
         # Store and display results
         self.current_results = result_df
-        self.display_results(result_df, f"{department} {course_number}")
+        self.display_results(result_df, f"{department} {course_number}", display=display)
+    
+    def cached_lookup(self, key: str, record: bool = True) -> Tuple[pl.DataFrame, str, Optional[DisplayRows]]:
+        """Run a lookup through the result cache, recording it in the query log once it succeeds."""
+        entry = self.result_cache.get(key)
+        if entry is None:
+            entry = compute_lookup(self.df, self.de_anza_courses, key)
+            self.result_cache.put(key, entry)
+        
+        if record:
+            self.query_log.record(key)
+        return entry
+    
+    def start_cache_warmup(self):
+        """Precompute the most frequently logged lookups on a background thread."""
+        keys = self.query_log.most_common(WARM_TOP_N)
+        if not keys:
+            return
+        threading.Thread(target=self._warm_cache, args=(keys,), name="cache-warmup", daemon=True).start()
+    
+    def _warm_cache(self, keys: List[str]):
+        """Fill the result cache, most frequent first, until the memory budget is reached."""
+        start = time.perf_counter()
+        warmed = 0
+        for key in keys:
+            if self.result_cache.get(key) is not None:
+                continue
+            try:
+                entry = compute_lookup(self.df, self.de_anza_courses, key)
+            except Exception as e:
+                # Drop it so a lookup that can never succeed doesn't come back every startup
+                print(f"Cache warm-up skipped {key}: {e}")
+                self.query_log.forget(key)
+                continue
+            if not self.result_cache.put(key, entry, evict=False):
+                break
+            warmed += 1
+        print(
+            f"Warmed {warmed} cached lookup(s) in {time.perf_counter() - start:.2f}s "
+            f"(~{self.result_cache.used_bytes / 1e6:.1f} MB)"
+        )
     
     def clear_selection(self):
         """Clear the current selection and reset the UI."""
@@ -671,12 +1319,62 @@ class EquivalencyApp:
             traceback.print_exc()
     
     def on_search_change(self, sender, app_data):
-        """Search callback - kept for future use but not currently active."""
-        pass
+        """Called on every keystroke in the search box; refreshes the suggestion dropdown."""
+        suggestions = self.suggest(app_data or "")
+        
+        self._suggestion_to_target = {f"{value}  [{kind}]": (kind, value) for kind, value in suggestions}
+        if dpg.does_item_exist("suggest_listbox"):
+            dpg.configure_item(
+                "suggest_listbox",
+                items=list(self._suggestion_to_target),
+                show=bool(suggestions),
+            )
+    
+    def on_suggestion_selected(self, sender, app_data):
+        """Called when a suggestion is picked from the autocomplete dropdown."""
+        target = self._suggestion_to_target.get(app_data)
+        if dpg.does_item_exist("suggest_listbox"):
+            dpg.configure_item("suggest_listbox", show=False)
+        if target is None:
+            return
+        
+        kind, value = target
+        if kind == "Dept":
+            # Same path as clicking the department in the listbox
+            if dpg.does_item_exist("dept_listbox"):
+                dpg.set_value("dept_listbox", value)
+            self.on_dept_selected("dept_listbox", value)
+            return
+        
+        if dpg.does_item_exist("search_input"):
+            dpg.set_value("search_input", value)
+        self.do_search(value)
     
     def do_search(self, query: str):
-        """Execute search - kept for future use but not currently active."""
-        pass
+        """Run smart_search for the query and show the results."""
+        if self.df is None:
+            return
+        
+        query = (query or "").strip()
+        self.last_query = query
+        if dpg.does_item_exist("suggest_listbox"):
+            dpg.configure_item("suggest_listbox", show=False)
+        
+        try:
+            result_df, message, display = self.cached_lookup(lookup_key("search", query), record=len(query) >= MIN_SEARCH_CHARS)
+        except pl.exceptions.ComputeError as e:
+            # smart_search treats each word as a regex, so input like "Intro (" can't be searched
+            print(f"Search error for {query!r}: {e}")
+            dpg.set_value("results_count", f'Could not search for "{query}" - check for unmatched ( or [')
+            self.clear_table()
+            return
+        if message:
+            dpg.set_value("results_count", f'No results for "{query}"')
+            self.clear_table()
+            return
+        
+        self.current_results = result_df
+        self.display_results(result_df, query, rank_query=query, display=display)
     
     def clear_table(self):
         """Clear all rows from results table."""
@@ -687,33 +1385,37 @@ class EquivalencyApp:
                 for child in children:
                     dpg.delete_item(child)
     
-    def display_results(self, result_df: pl.DataFrame, query: str):
-        """Display search results in table."""
+    def display_results(
+        self,
+        result_df: pl.DataFrame,
+        query: str,
+        rank_query: Optional[str] = None,
+        display: Optional[DisplayRows] = None,
+    ):
+        """
+        Display search results in table.
+        With rank_query, rows are shown best match first and only the top
+        MAX_DISPLAY_RESULTS are kept; otherwise the first rows are shown.
+        Pass display (from prepare_display or the cache) to skip formatting.
+        """
         self.clear_table()
         
-        total_rows = result_df.height
-        unique_cids = result_df["C-ID #"].unique().to_list()
+        if display is None:
+            display = prepare_display(result_df, rank_query)
+        total_rows, unique_cids, rows = display
         
         # Limit results
         if total_rows > MAX_DISPLAY_RESULTS:
-            result_df = result_df.head(MAX_DISPLAY_RESULTS)
+            shown = "top" if rank_query is not None else "first"
+            suffix = " by relevance" if rank_query is not None else ""
             dpg.set_value("results_count", 
-                         f'Found {len(unique_cids)} C-ID(s), {total_rows} course(s) - Showing first {MAX_DISPLAY_RESULTS}')
+                         f'Found {unique_cids} C-ID(s), {total_rows} course(s) - Showing {shown} {MAX_DISPLAY_RESULTS}{suffix}')
         else:
             dpg.set_value("results_count", 
-                         f'Found {len(unique_cids)} C-ID(s), {total_rows} course(s)')
+                         f'Found {unique_cids} C-ID(s), {total_rows} course(s)')
         
         # Add rows
-        for row_dict in result_df.iter_rows(named=True):
-            school = (row_dict.get("Institution") or "").strip()
-            local_course = (row_dict.get("Local Dept. Name & Number") or "").strip()
-            dept, number = extract_dept_and_number(local_course)
-            title = (row_dict.get("Local Course Title(s)") or "").strip()
-            cid = (row_dict.get("C-ID #") or "").strip()
-            
-            # Check if De Anza
-            is_de_anza = HOME_INSTITUTION.upper() in school.upper()
-            
+        for cid, school, dept, number, title, is_de_anza in rows:
             with dpg.table_row(parent="results_table"):
                 # Column order: C-ID, School, Dept, Number, Title
                 if is_de_anza:
@@ -738,6 +1440,8 @@ class EquivalencyApp:
             try:
                 self.load_de_anza_courses()
                 self.populate_departments()
+                self.build_suggestion_indexes()
+                self.start_cache_warmup()
             except Exception as e:
                 print(f"Error loading De Anza courses: {e}")
                 import traceback
@@ -747,9 +1451,28 @@ class EquivalencyApp:
         
         dpg.start_dearpygui()
         dpg.destroy_context()
+        
+        if not self.load_error:
+            self.query_log.save()
 
 
 def main():
+    parser = argparse.ArgumentParser(description="De Anza College C-ID course equivalency lookup")
+    parser.add_argument(
+        "--export-matrix",
+        metavar="PATH",
+        help=f"write the full De Anza x institution articulation matrix ({', '.join(MATRIX_FORMATS)}) and exit",
+    )
+    args = parser.parse_args()
+    
+    if args.export_matrix:
+        try:
+            export_articulation_matrix(load_data(DATA_FILE), args.export_matrix)
+        except (CidCsvError, MatrixExportError) as e:
+            print(f"Matrix export failed: {e}")
+            sys.exit(1)
+        return
+    
     app = EquivalencyApp()
     app.run()
 
@@ -0,0 +1,709 @@
+"""
+Differential check and latency gate for the C-ID lookups.
+
+The reference_* functions below are frozen copies of the original
+smart_search / department / equivalency lookups. They are the oracle:
+any optimized version in app.py must return the same rows for the same
+query or selection. Randomized queries and selections are run against a
+synthetic cid.csv and, if present, the real one; each operation must also
+stay inside its latency budget.
+
+Run it before landing search or index changes:
+    uv run python verify_search.py
+    uv run python verify_search.py --csv path/to/cid.csv --seed 7 --rounds 500
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import polars as pl
+
+from app import (
+    DATA_FILE,
+    HOME_INSTITUTION,
+    MATRIX_KEY_COLS,
+    MAX_DISPLAY_RESULTS,
+    REQUIRED_COLS,
+    MatrixExportError,
+    PrefixIndex,
+    ResultCache,
+    compute_lookup,
+    de_anza_course_table,
+    department_matrix,
+    department_results,
+    equivalency_results,
+    export_articulation_matrix,
+    is_home_institution,
+    load_data,
+    lookup_key,
+    matrix_institutions,
+    prepare_display,
+    rank_results,
+    smart_search,
+)
+
+MIN_SEARCH_CHARS = 2
+
+# p95 latency budget per operation, in milliseconds
+LATENCY_BUDGETS_MS = {
+    "smart_search": 250.0,
+    "rank_results": 50.0,
+    "department_results": 50.0,
+    "equivalency_results": 50.0,
+    "suggest": 0.5,
+    "cache_fill": 300.0,
+    "warm_lookup": 0.5,
+}
+
+
+# ---------------------------------------------------------------------------
+# Reference oracle (frozen; do not optimize)
+# ---------------------------------------------------------------------------
+
+def reference_smart_search(df: pl.DataFrame, query: str) -> pl.DataFrame:
+    """Frozen copy of the original smart_search."""
+    query = query.strip()
+    if not query or len(query) < MIN_SEARCH_CHARS:
+        return pl.DataFrame()
+
+    cid_pattern = re.match(r'^([A-Z]{2,5})[\s-]+(\d+[A-Z]?)\s*(.*)$', query.upper())
+    if cid_pattern:
+        dept_code = cid_pattern.group(1)
+        cid_number = cid_pattern.group(2)
+        extra = cid_pattern.group(3).strip()
+
+        cid_query = f"{dept_code} {cid_number}"
+        cid_results = df.filter(
+            pl.col("C-ID #").fill_null("").str.to_uppercase().str.contains(cid_query)
+        )
+
+        if not cid_results.is_empty():
+            if extra:
+                for keyword in extra.split():
+                    cid_results = cid_results.filter(
+                        pl.col("Institution_norm").str.contains(keyword) |
+                        pl.col("Title_norm").str.contains(keyword)
+                    )
+
+            is_de_anza = pl.col("Institution_norm").str.contains(HOME_INSTITUTION.upper())
+            de_anza_rows = cid_results.filter(is_de_anza)
+            other_rows = cid_results.filter(~is_de_anza)
+            return pl.concat([de_anza_rows, other_rows]) if not other_rows.is_empty() else de_anza_rows
+
+    keywords = query.upper().split()
+    results = df
+
+    institution_keywords = []
+    non_institution_keywords = []
+
+    for keyword in keywords:
+        institution_match = df.filter(pl.col("Institution_norm").str.contains(keyword))
+        if not institution_match.is_empty():
+            institution_keywords.append(keyword)
+        else:
+            non_institution_keywords.append(keyword)
+
+    if institution_keywords:
+        for inst_kw in institution_keywords:
+            results = results.filter(pl.col("Institution_norm").str.contains(inst_kw))
+
+    common_words = {'DE', 'LA', 'OF', 'AND', 'THE', 'FOR', 'IN', 'ON', 'AT', 'TO', 'A', 'AN'}
+    dept_pattern = re.compile(r'^[A-Z]{2,5}$')
+
+    dept_keywords = []
+    title_keywords = []
+
+    for keyword in non_institution_keywords:
+        if dept_pattern.match(keyword) and keyword not in common_words:
+            dept_count = results.filter(pl.col("Dept_norm").str.contains(rf"\b{re.escape(keyword)}")).height
+            title_count = results.filter(pl.col("Title_norm").str.contains(keyword)).height
+
+            if dept_count > 0 and (title_count < dept_count * 10):
+                dept_keywords.append(keyword)
+            elif title_count > 0:
+                title_keywords.append(keyword)
+        else:
+            title_keywords.append(keyword)
+
+    for dept_kw in dept_keywords:
+        results = results.filter(pl.col("Dept_norm").str.contains(rf"\b{re.escape(dept_kw)}"))
+
+    for title_kw in title_keywords:
+        results = results.filter(pl.col("Title_norm").str.contains(title_kw))
+
+    if results.is_empty():
+        return pl.DataFrame()
+
+    if not institution_keywords:
+        cids = results["C-ID #"].unique().to_list()
+        if not cids:
+            return pl.DataFrame()
+
+        all_results = df.filter(pl.col("C-ID #").is_in(cids))
+        is_de_anza = pl.col("Institution_norm").str.contains(HOME_INSTITUTION.upper())
+        de_anza_rows = all_results.filter(is_de_anza)
+        other_rows = all_results.filter(~is_de_anza)
+        results = pl.concat([de_anza_rows, other_rows]) if not other_rows.is_empty() else de_anza_rows
+
+    return results.unique(
+        subset=["C-ID #", "C-ID Descriptor", "Institution", "Local Dept. Name & Number", "Local Course Title(s)"]
+    )
+
+
+def reference_de_anza_courses(df: pl.DataFrame) -> pl.DataFrame:
+    """Frozen copy of the original EquivalencyApp.load_de_anza_courses table."""
+    de_anza_df = df.filter(
+        pl.col("Institution").str.to_uppercase().str.contains("DE ANZA")
+    )
+    de_anza_df = de_anza_df.filter(
+        pl.col("C-ID #").is_not_null() & (pl.col("C-ID #") != "")
+    )
+    de_anza_df = de_anza_df.with_columns([
+        pl.col("Local Dept. Name & Number").str.extract(r'^([A-Z\s]+?)\s+([0-9].*)$', 1).fill_null("").str.strip_chars().alias("Dept"),
+        pl.col("Local Dept. Name & Number").str.extract(r'^([A-Z\s]+?)\s+([0-9].*)$', 2).fill_null("").str.strip_chars().alias("Number"),
+    ])
+    return de_anza_df.filter(
+        (pl.col("Dept") != "") & (pl.col("Number") != "")
+    )
+
+
+def reference_department_courses(df: pl.DataFrame, de_anza_courses: pl.DataFrame, department: str) -> Tuple[pl.DataFrame, str]:
+    """Frozen copy of the original EquivalencyApp.show_department_courses lookup."""
+    dept_courses = de_anza_courses.filter(pl.col("Dept") == department)
+    if dept_courses.is_empty():
+        return df.head(0), "No courses found for this department"
+
+    cids = dept_courses["C-ID #"].unique().to_list()
+    result_df = df.filter(pl.col("C-ID #").is_in(cids))
+    if result_df.is_empty():
+        return result_df, "No courses found"
+    return result_df, ""
+
+
+def reference_equivalencies(
+    df: pl.DataFrame, de_anza_courses: pl.DataFrame, department: str, course_number: str
+) -> Tuple[pl.DataFrame, str]:
+    """Frozen copy of the original EquivalencyApp.show_equivalencies lookup."""
+    number_match = (
+        (pl.col("Number") == course_number)
+        | pl.col("Number").str.starts_with(course_number + " ")
+        | pl.col("Number").str.starts_with(course_number + "+")
+    )
+    de_anza_course = de_anza_courses.filter(
+        (pl.col("Dept") == department) & number_match
+    )
+    if de_anza_course.is_empty():
+        return df.head(0), "Course not found"
+
+    cids = de_anza_course["C-ID #"].unique().to_list()
+    if not cids or cids[0] == "":
+        return df.head(0), "No CID found for this course"
+
+    result_df = df.filter(pl.col("C-ID #").is_in(cids))
+    if result_df.is_empty():
+        return result_df, "No equivalent courses found"
+    return result_df, ""
+
+
+def reference_suggest(terms: List[str], prefix: str, limit: int) -> List[str]:
+    """Linear-scan equivalent of PrefixIndex.suggest."""
+    def norm(s: str) -> str:
+        return " ".join(s.upper().split())
+
+    prefix = norm(prefix)
+    if not prefix or limit <= 0:
+        return []
+
+    terms = [t.strip() for t in terms if t and norm(t)]
+    full = sorted((norm(t), t) for t in terms if norm(t).startswith(prefix))
+    words = sorted(
+        (norm(t)[m.end():], t)
+        for t in terms
+        for m in re.finditer(" ", norm(t))
+        if norm(t)[m.end():].startswith(prefix)
+    )
+    results = []
+    for _, term in full + words:
+        if len(results) >= limit:
+            break
+        if term not in results:
+            results.append(term)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Data
+# ---------------------------------------------------------------------------
+
+SYNTHETIC_DEPTS = [
+    # (C-ID code, local dept name, title stems)
+    ("ACCT", "ACCT", ["Financial Accounting", "Managerial Accounting", "Intro to Accounting"]),
+    ("BIOL", "BIOL", ["Human Anatomy", "Human Physiology", "Intro to Biology", "Microbiology"]),
+    ("MATH", "MATH", ["Calculus I", "Calculus II", "Intro to Statistics", "Linear Algebra"]),
+    ("ENGL", "ENGL", ["College Composition", "Critical Thinking and Writing", "Intro to Literature"]),
+    ("CDEV", "C D", ["Child Growth and Development", "Child, Family and Community"]),
+    ("COMP", "CIS", ["Programming Concepts", "Data Structures", "Intro to Programming"]),
+    ("PSY", "PSYC", ["Intro to Psychology", "Research Methods in Psychology"]),
+    ("ECON", "ECON", ["Principles of Macroeconomics", "Principles of Microeconomics"]),
+    ("CHEM", "CHEM", ["General Chemistry", "Organic Chemistry", "Intro to Chemistry"]),
+    ("ARTH", "ARTS", ["Art History: Prehistoric to Gothic", "Intro to Art History"]),
+]
+
+SYNTHETIC_INSTITUTIONS = [
+    HOME_INSTITUTION,
+    "Foothill College",
+    "Hartnell College",
+    "College of the Canyons",
+    "Los Angeles Pierce College",
+    "Santa Rosa Junior College",
+    "Mission College",
+    "East Los Angeles College",
+]
+
+
+def synthetic_cid_frame(seed: int, n_cids: int = 300) -> pl.DataFrame:
+    """Build a raw cid.csv-shaped frame (all strings, some nulls and odd formats)."""
+    rng = random.Random(seed)
+    rows = []
+    seen_cids = set()
+    while len(seen_cids) < n_cids:
+        code, local_dept, stems = rng.choice(SYNTHETIC_DEPTS)
+        cid = f"{code} {rng.randint(100, 299)}{rng.choice(['', '', '', 'L', 'S', 'H'])}"
+        if cid in seen_cids:
+            continue
+        seen_cids.add(cid)
+        descriptor = rng.choice(stems)
+
+        for institution in SYNTHETIC_INSTITUTIONS:
+            odds = 0.7 if institution == HOME_INSTITUTION else 0.45
+            if rng.random() > odds:
+                continue
+            number = f"{rng.randint(1, 99)}{rng.choice(['', '', 'A', 'B', 'C', 'H'])}"
+            local = f"{local_dept} {number}"
+            if rng.random() < 0.1:
+                local += f" + {local_dept} {number[:-1] or number}L"
+            title = descriptor if rng.random() < 0.6 else f"{rng.choice(['', 'Honors ', 'Intro: '])}{descriptor}"
+            rows.append({
+                "C-ID #": cid if rng.random() > 0.02 else None,
+                "C-ID Descriptor": descriptor,
+                "Institution": institution,
+                "Local Course Title(s)": title if rng.random() > 0.03 else None,
+                "Local Dept. Name & Number": local if rng.random() > 0.02 else local_dept,
+            })
+    return pl.DataFrame(rows, schema={c: pl.String for c in REQUIRED_COLS})
+
+
+def load_frame(raw: pl.DataFrame) -> pl.DataFrame:
+    """Round-trip a raw frame through a CSV so it takes the real load_data path."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cid.csv")
+        raw.write_csv(path)
+        return load_data(path)
+
+
+def load_synthetic(seed: int, n_cids: int) -> pl.DataFrame:
+    return load_frame(synthetic_cid_frame(seed, n_cids))
+
+
+# ---------------------------------------------------------------------------
+# Ranking rules
+# ---------------------------------------------------------------------------
+
+def _course(cid: str, institution: str, local: str, title: str) -> Dict[str, str]:
+    return {
+        "C-ID #": cid,
+        "C-ID Descriptor": title,
+        "Institution": institution,
+        "Local Course Title(s)": title,
+        "Local Dept. Name & Number": local,
+    }
+
+
+# (rule, query, row that must rank first, row it must beat).
+# The losing row always wins the RANK_TIE_COLS tie-break, so only the score can put the winner first.
+RANKING_CASES = [
+    ("exact C-ID hit ranks above a non-hit", "ACCT 110",
+     _course("ACCT 110", "Foothill College", "ACCT 1A", "Financial Accounting"),
+     _course("ACCT 100", "Foothill College", "ACCT 1A", "Financial Accounting")),
+    ("department hit outranks an otherwise equal row", "ACCT INTRO",
+     _course("ZZZ 100", "Foothill College", "ACCT 1", "Intro to Accounting"),
+     _course("AAA 100", "Foothill College", "BUS 1", "Intro to Accounting")),
+    ("home institution outranks an otherwise equal row", "INTRO",
+     _course("ENGL 100", HOME_INSTITUTION, "EWRT 1A", "Intro to Composition"),
+     _course("ENGL 100", "Alpha College", "EWRT 1A", "Intro to Composition")),
+    ("title terms match whole words (ART vs DEPARTMENT)", "ART",
+     _course("ZZZ 100", "Foothill College", "HUM 1", "Art History"),
+     _course("AAA 100", "Foothill College", "HUM 1", "Department Start Studies")),
+    ("title terms match whole words (INTRO vs INTRODUCTION)", "INTRO",
+     _course("ZZZ 100", "Foothill College", "BIOL 1", "Intro to Biology"),
+     _course("AAA 100", "Foothill College", "BIOL 1", "Introduction to Biology")),
+]
+
+
+def check_ranking_rules() -> List[str]:
+    """Each RANKING_CASES winner must come first, whichever order the rows are given in."""
+    failures = []
+    for rule, query, winner, loser in RANKING_CASES:
+        for rows in ([winner, loser], [loser, winner]):
+            df = load_frame(pl.DataFrame(rows, schema={c: pl.String for c in REQUIRED_COLS}))
+            first = rank_results(df, query, 2).row(0, named=True)
+            if any(first[c] != winner[c] for c in REQUIRED_COLS):
+                failures.append(f"[ranking] {rule}: {query!r} ranked {first['C-ID #']} / {first['Local Course Title(s)']} first")
+                break
+    return failures
+
+
+# ---------------------------------------------------------------------------
+# Articulation matrix
+# ---------------------------------------------------------------------------
+
+def reference_matrix(df: pl.DataFrame, institutions: List[str]) -> Dict[tuple, tuple]:
+    """
+    Brute-force matrix: De Anza course key -> one cell per institution, built by
+    filtering df on (C-ID, institution) row by row. Empty strings count as null,
+    since CSV can't tell them apart.
+    """
+    equivalents: Dict[Tuple[str, str], set] = {}
+    for row in df.iter_rows(named=True):
+        key = (row["C-ID #"], row["Institution"])
+        courses = equivalents.setdefault(key, set())
+        if row["Local Dept. Name & Number"] is not None:
+            courses.add(row["Local Dept. Name & Number"].strip())
+
+    matrix = {}
+    for row in de_anza_course_table(df).iter_rows(named=True):
+        key = tuple(
+            row[c] or None
+            for c in ("Dept", "C-ID #", "C-ID Descriptor", "Local Dept. Name & Number", "Local Course Title(s)")
+        )
+        cells = []
+        for institution in institutions:
+            courses = equivalents.get((row["C-ID #"], institution))
+            cells.append("; ".join(sorted(courses)) or None if courses is not None else None)
+        matrix[key] = tuple(cells)
+    return matrix
+
+
+def _has_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Random queries and selections
+# ---------------------------------------------------------------------------
+
+def random_query(rng: random.Random, df: pl.DataFrame) -> str:
+    """Pick a query in one of the shapes evaluators actually type."""
+    row = df.row(rng.randrange(df.height), named=True)
+    cid = row["C-ID #"] or "ACCT 110"
+    institution_words = (row["Institution"] or "De Anza").split()
+    title_words = (row["Local Course Title(s)"] or "Intro").split() or ["Intro"]
+    dept = (row["Local Dept. Name & Number"] or "ACCT").split()[0]
+
+    shape = rng.randrange(9)
+    if shape == 0:
+        query = cid
+    elif shape == 1:
+        query = f"{cid} {rng.choice(institution_words)}"
+    elif shape == 2:
+        query = cid.replace(" ", "-")
+    elif shape == 3:
+        query = dept
+    elif shape == 4:
+        query = f"{dept} {rng.choice(institution_words)}"
+    elif shape == 5:
+        query = " ".join(rng.sample(title_words, min(len(title_words), rng.randint(1, 2))))
+    elif shape == 6:
+        query = rng.choice(["INTRO", "intro", "Calculus", "de anza", "Foothill", "College"])
+    elif shape == 7:
+        query = rng.choice(["", " ", "a", "zzqx", "MATH 999", "XYZ 1"])
+    else:
+        query = f"{rng.choice(title_words)} {rng.choice(institution_words)}"
+    return query.lower() if rng.random() < 0.2 else query
+
+
+def random_selection(rng: random.Random, de_anza_courses: pl.DataFrame) -> Tuple[str, str]:
+    """Pick a (department, course number) pair the way the listboxes would, plus some misses."""
+    if de_anza_courses.is_empty() or rng.random() < 0.05:
+        return rng.choice(["NOPE", "C D", "ACCT"]), rng.choice(["999", "1A", ""])
+    row = de_anza_courses.row(rng.randrange(de_anza_courses.height), named=True)
+    first_number = row["Number"].split("+")[0].strip()
+    return row["Dept"], first_number
+
+
+# ---------------------------------------------------------------------------
+# Checks
+# ---------------------------------------------------------------------------
+
+def _rows(df: pl.DataFrame) -> List[tuple]:
+    return df.rows()
+
+
+def _row_multiset(df: pl.DataFrame) -> List[tuple]:
+    return sorted(df.rows(), key=repr)
+
+
+class Harness:
+    """Runs every check for one dataset and collects failures and timings."""
+
+    def __init__(self, label: str, df: pl.DataFrame, seed: int):
+        self.label = label
+        self.df = df
+        self.rng = random.Random(seed)
+        self.timings: Dict[str, List[float]] = {op: [] for op in LATENCY_BUDGETS_MS}
+        self.failures: List[str] = []
+        self.de_anza_courses = de_anza_course_table(df)
+        self.cache = ResultCache()
+
+    def timed(self, op: str, fn: Callable, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        self.timings[op].append((time.perf_counter() - start) * 1000)
+        return result
+
+    def fail(self, message: str):
+        self.failures.append(f"[{self.label}] {message}")
+
+    def _fill_cache(self, key: str):
+        """What warm-up and a first click both do: compute the lookup and store it."""
+        entry = compute_lookup(self.df, self.de_anza_courses, key)
+        self.cache.put(key, entry)
+        return entry
+
+    def check_cached(self, key: str, expected: pl.DataFrame, expected_message: str, rank_query: Optional[str] = None):
+        """
+        The cached path the app uses (compute_lookup + ResultCache) must match the oracle,
+        including the display rows. Search results (rank_query set) come from unique(),
+        so their row order isn't stable and they are compared as multisets;
+        the ranked display rows don't depend on that order and must match exactly.
+        """
+        self.timed("cache_fill", self._fill_cache, key)
+        entry = self.timed("warm_lookup", self.cache.get, key)
+        if entry is None:
+            self.fail(f"{key} was not kept by the result cache")
+            return
+
+        result_df, message, display = entry
+        ordered = rank_query is None
+        rows = _rows(result_df) if ordered else _row_multiset(result_df)
+        expected_rows = _rows(expected) if ordered else _row_multiset(expected)
+        if message != expected_message or rows != expected_rows:
+            self.fail(f"cached lookup {key} differs from the oracle")
+            return
+
+        if message:
+            if display is not None:
+                self.fail(f"cached lookup {key} has display rows but no results")
+            return
+        expected_display = prepare_display(expected, rank_query)
+        if display is None or display[:2] != expected_display[:2]:
+            self.fail(f"cached display counts for {key} differ from the oracle")
+        elif display[2] != expected_display[2]:
+            self.fail(f"cached display rows for {key} differ from the oracle")
+
+    def check_course_table(self):
+        if not self.de_anza_courses.equals(reference_de_anza_courses(self.df)):
+            self.fail("de_anza_course_table differs from the oracle")
+
+    def check_search(self, query: str):
+        expected = reference_smart_search(self.df, query)
+        actual = self.timed("smart_search", smart_search, self.df, query)
+        if expected.columns != actual.columns or _row_multiset(expected) != _row_multiset(actual):
+            self.fail(f"smart_search({query!r}): {actual.height} rows, oracle has {expected.height}")
+            return
+        if query.strip():
+            expected_message = "" if not expected.is_empty() else "No results"
+            self.check_cached(lookup_key("search", query), expected, expected_message, rank_query=query)
+
+        ranked = self.timed("rank_results", rank_results, actual, query, MAX_DISPLAY_RESULTS)
+        if ranked.height != min(actual.height, MAX_DISPLAY_RESULTS):
+            self.fail(f"rank_results({query!r}) kept {ranked.height} of {actual.height} rows")
+        elif not set(ranked.rows()) <= set(actual.rows()):
+            self.fail(f"rank_results({query!r}) returned rows not in the search results")
+        if actual.is_empty():
+            return
+
+        # smart_search's row order changes between calls; the ranking must not
+        again = rank_results(smart_search(self.df, query), query, MAX_DISPLAY_RESULTS)
+        if again.rows() != ranked.rows():
+            self.fail(f"rank_results({query!r}) order changed between two calls")
+
+        # Partial selection must agree with a full sort followed by head(k)
+        k = self.rng.choice([1, 5, 20, max(1, actual.height // 2)])
+        full = rank_results(actual, query, actual.height)
+        if rank_results(actual, query, k).rows() != full.head(k).rows():
+            self.fail(f"rank_results({query!r}, top_k={k}) differs from a full sort + head({k})")
+
+    def check_department(self, department: str):
+        expected = reference_department_courses(self.df, self.de_anza_courses, department)
+        actual = self.timed("department_results", department_results, self.df, self.de_anza_courses, department)
+        if actual[1] != expected[1] or _rows(actual[0]) != _rows(expected[0]):
+            self.fail(f"department_results({department!r}) differs from the oracle")
+        self.check_cached(lookup_key("dept", department), expected[0], expected[1])
+
+    def check_equivalency(self, department: str, course_number: str):
+        expected = reference_equivalencies(self.df, self.de_anza_courses, department, course_number)
+        actual = self.timed(
+            "equivalency_results", equivalency_results, self.df, self.de_anza_courses, department, course_number
+        )
+        if actual[1] != expected[1] or _rows(actual[0]) != _rows(expected[0]):
+            self.fail(f"equivalency_results({department!r}, {course_number!r}) differs from the oracle")
+        self.check_cached(lookup_key("course", department, course_number), expected[0], expected[1])
+
+    def check_suggestions(self, rounds: int):
+        sources = {
+            "departments": self.de_anza_courses["Dept"].unique().to_list(),
+            "C-IDs": self.df["C-ID #"].drop_nulls().unique().to_list(),
+            "institutions": self.df["Institution"].drop_nulls().unique().to_list(),
+        }
+        for name, terms in sources.items():
+            index = PrefixIndex(terms)
+            for _ in range(rounds):
+                term = self.rng.choice(terms) if terms else "A"
+                prefix = term[: self.rng.randint(1, max(1, len(term)))]
+                if self.rng.random() < 0.3 and " " in term:
+                    prefix = term.split(" ", 1)[1][:3]
+                prefix = prefix.lower() if self.rng.random() < 0.3 else prefix
+                limit = self.rng.choice([1, 5, 12])
+                actual = self.timed("suggest", index.suggest, prefix, limit)
+                if actual != reference_suggest(terms, prefix, limit):
+                    self.fail(f"PrefixIndex.suggest({prefix!r}) over {name} differs from a linear scan")
+
+    def check_matrix(self):
+        """
+        Exported CSV and Parquet matrices must match reference_matrix, every
+        department slice must have the same columns, and the empty-data and
+        bad-path cases must behave.
+        """
+        institutions = matrix_institutions(self.df)
+        columns = MATRIX_KEY_COLS + institutions
+        for department in self.de_anza_courses["Dept"].unique().sort().to_list():
+            chunk = department_matrix(self.df, self.de_anza_courses, department, institutions)
+            if chunk.columns != columns or any(dtype != pl.String for dtype in chunk.dtypes):
+                self.fail(f"matrix slice for {department!r} doesn't have the shared column schema")
+                break
+
+        expected = reference_matrix(self.df, institutions)
+        readers = [(".csv", lambda p: pl.read_csv(p, infer_schema_length=0))]
+        if _has_pyarrow():
+            readers.append((".parquet", pl.read_parquet))
+        else:
+            print("  pyarrow not installed; skipping the Parquet matrix check")
+
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            for ext, reader in readers:
+                path = os.path.join(tmp, f"matrix{ext}")
+                written = export_articulation_matrix(self.df, path)
+                self._compare_matrix(ext, reader(path), written, columns, expected)
+
+            # No De Anza rows: header only, still with every institution column
+            empty_df = self.df.filter(~is_home_institution().fill_null(False))
+            path = os.path.join(tmp, "empty.csv")
+            export_articulation_matrix(empty_df, path)
+            empty = pl.read_csv(path, infer_schema_length=0)
+            if empty.height != 0 or empty.columns != MATRIX_KEY_COLS + matrix_institutions(empty_df):
+                self.fail("matrix export without De Anza rows isn't an empty, header-only file")
+
+            bad_paths = [os.path.join(tmp, "missing", f"matrix{ext}") for ext in (".csv", ".parquet", ".xlsx")]
+            for path in bad_paths + [os.path.join(tmp, "matrix.txt")]:
+                try:
+                    export_articulation_matrix(self.df, path)
+                except MatrixExportError:
+                    continue
+                except Exception as e:
+                    self.fail(f"matrix export to {path} raised {type(e).__name__}, not MatrixExportError")
+                    continue
+                self.fail(f"matrix export to {path} didn't fail")
+
+    def _compare_matrix(self, ext: str, actual: pl.DataFrame, written: int, columns: List[str], expected: Dict[tuple, tuple]):
+        if actual.columns != columns:
+            self.fail(f"{ext} matrix columns differ from MATRIX_KEY_COLS + institutions")
+            return
+        if actual.height != written or actual.height != len(expected):
+            self.fail(f"{ext} matrix has {actual.height} rows (reported {written}), expected {len(expected)}")
+            return
+        key_count = len(MATRIX_KEY_COLS)
+        mismatches = 0
+        for row in actual.iter_rows():
+            row = tuple(value or None for value in row)
+            if expected.get(row[:key_count]) != row[key_count:]:
+                mismatches += 1
+        if mismatches:
+            self.fail(f"{ext} matrix: {mismatches} of {actual.height} rows differ from a brute-force filter")
+
+    def run(self, rounds: int):
+        self.check_course_table()
+        for _ in range(rounds):
+            self.check_search(random_query(self.rng, self.df))
+            department, course_number = random_selection(self.rng, self.de_anza_courses)
+            self.check_department(department)
+            self.check_equivalency(department, course_number)
+        self.check_suggestions(rounds)
+        self.check_matrix()
+
+    def check_budgets(self):
+        for op, budget in LATENCY_BUDGETS_MS.items():
+            samples = self.timings[op]
+            if not samples:
+                continue
+            p95 = _p95(samples)
+            status = "ok" if p95 <= budget else "OVER BUDGET"
+            print(f"  {op:<22} n={len(samples):<5} median={statistics.median(samples):8.3f} ms  "
+                  f"p95={p95:8.3f} ms  budget={budget:g} ms  {status}")
+            if p95 > budget:
+                self.fail(f"{op} p95 {p95:.3f} ms exceeds budget of {budget:g} ms")
+
+
+def _p95(samples: List[float]) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check lookups against the reference oracle and latency budgets.")
+    parser.add_argument("--csv", default=DATA_FILE, help="real-shaped cid.csv to check (skipped if missing)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for data, queries and selections")
+    parser.add_argument("--rounds", type=int, default=200, help="random queries/selections per dataset")
+    parser.add_argument("--synthetic-cids", type=int, default=300, help="C-IDs in the synthetic dataset")
+    parser.add_argument("--no-budgets", action="store_true", help="check results only, skip latency budgets")
+    args = parser.parse_args()
+
+    datasets = [("synthetic", load_synthetic(args.seed, args.synthetic_cids))]
+    if os.path.isfile(args.csv):
+        datasets.append((os.path.basename(args.csv), load_data(args.csv)))
+    else:
+        print(f"No real data at {args.csv}; checking synthetic data only")
+
+    failures = check_ranking_rules()
+    for label, df in datasets:
+        print(f"{label}: {df.height} rows, {args.rounds} rounds")
+        harness = Harness(label, df, args.seed)
+        harness.run(args.rounds)
+        if not args.no_budgets:
+            harness.check_budgets()
+        failures.extend(harness.failures)
+
+    if failures:
+        print(f"\n{len(failures)} failure(s):")
+        for failure in failures[:50]:
+            print(f"  {failure}")
+        return 1
+    print("\nAll lookups match the reference oracle.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())